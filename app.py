@@ -2,6 +2,10 @@ import streamlit as st
 import pages.Dashboard as Dashboard
 import pages.CARE_Form as CARE_Form
 import pages.Landing as Landing
+import pages.Exports as Exports
+import pages.Analytics as Analytics
+import pages.Email_Delivery as Email_Delivery
+from scripts.email_utils import notifications_enabled
 
 st.set_page_config(page_title="C.A.R.E Dashboard", layout="wide")
 
@@ -11,10 +15,19 @@ if "user_email" not in st.session_state:
 else:
     # Sidebar navigation with Dashboard listed first
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Dashboard", "CARE Form"])
+    pages = ["Dashboard", "CARE Form", "Exports", "Analytics"]
+    if notifications_enabled():
+        pages.append("Email Delivery")
+    page = st.sidebar.radio("Go to", pages)
 
     # Load the selected page
     if page == "Dashboard":
         Dashboard.main()
     elif page == "CARE Form":
         CARE_Form.main()
+    elif page == "Exports":
+        Exports.main()
+    elif page == "Analytics":
+        Analytics.main()
+    elif page == "Email Delivery":
+        Email_Delivery.main()
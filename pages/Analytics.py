@@ -0,0 +1,71 @@
+import streamlit as st
+from scripts.db_utils import get_regions, get_approval_analytics
+
+
+def main():
+    # Check if the user has provided their email
+    if "user_email" not in st.session_state:
+        st.warning("To gain access to the app, you need to first provide your email.")
+        st.stop()  # Stop further execution until the email is provided
+
+    st.title("CARE Approval Analytics")
+
+    # Filters, read from the monthly aggregates rather than the full submissions history
+    region = st.selectbox("Region", ["All"] + get_regions())
+    aggregates = get_approval_analytics(region=None if region == "All" else region)
+    if aggregates.empty:
+        st.info("No approved CARE submissions yet." if region == "All" else
+                f"No approved CARE submissions for {region} yet.")
+        st.stop()
+
+    branch_codes = sorted(aggregates['branch_code'].unique())
+    branch_code = st.selectbox("Branch Code", ["All"] + branch_codes)
+    if branch_code != "All":
+        aggregates = aggregates[aggregates['branch_code'] == branch_code]
+
+    months = sorted(aggregates['month'].unique())
+    if len(months) > 1:
+        first_month, last_month = st.select_slider("Months", options=months, value=(months[0], months[-1]))
+        aggregates = aggregates[(aggregates['month'] >= first_month) & (aggregates['month'] <= last_month)]
+
+    # Headline totals for the selection
+    totals = aggregates[['approvals', 'value_approved', 'repair_team_hours', 'repair_labour_hours',
+                         'turnaround_count', 'turnaround_days']].sum()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Approvals", f"{int(totals['approvals']):,}")
+    col2.metric("Value Approved", "${:,.2f}".format(totals['value_approved']))
+    col3.metric("Hours Approved", f"{totals['repair_team_hours'] + totals['repair_labour_hours']:,.1f}")
+    if totals['turnaround_count']:
+        col4.metric("Avg DM→RVP Turnaround", f"{totals['turnaround_days'] / totals['turnaround_count']:.1f} days")
+    else:
+        col4.metric("Avg DM→RVP Turnaround", "N/A")
+
+    # Monthly value and hours by WO type
+    by_type = aggregates.groupby(['month', 'wo_type'], as_index=False)[
+        ['value_approved', 'repair_team_hours', 'repair_labour_hours']].sum()
+    by_type['hours_approved'] = by_type['repair_team_hours'] + by_type['repair_labour_hours']
+    by_type['wo_type'] = by_type['wo_type'].replace("", "Unspecified")
+
+    st.subheader("Value Approved by Month")
+    st.bar_chart(by_type, x='month', y='value_approved', color='wo_type')
+
+    st.subheader("Hours Approved by Month")
+    st.bar_chart(by_type, x='month', y='hours_approved', color='wo_type')
+
+    # Average turnaround per month, weighted by the number of approvals with both dates
+    turnaround = aggregates.groupby('month', as_index=False)[['turnaround_days', 'turnaround_count']].sum()
+    turnaround = turnaround[turnaround['turnaround_count'] > 0].assign(
+        avg_turnaround_days=lambda df: df['turnaround_days'] / df['turnaround_count'])
+    st.subheader("Average DM→RVP Turnaround (days)")
+    st.line_chart(turnaround, x='month', y='avg_turnaround_days')
+
+    # Totals by region and branch for the selected months
+    st.subheader("By Region and Branch")
+    by_branch = aggregates.groupby(['region', 'branch_code'], as_index=False)[
+        ['approvals', 'value_approved', 'repair_team_hours', 'repair_labour_hours']].sum()
+    st.dataframe(by_branch, hide_index=True, use_container_width=True)
+
+
+# Run main() if this file is executed
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,36 @@
 import streamlit as st
-from scripts.db_utils import retrieve_units_data, get_branch_code, save_to_care_submissions, update_unit_status
+from scripts.db_utils import retrieve_units_data, get_branch_code, save_to_care_submissions, update_unit_status, \
+    get_rvp_emails, WO_TYPES
+from scripts.email_utils import notifications_enabled, send_rvp_email, rvp_form_link, rvp_email_body, \
+    RVP_EMAIL_SUBJECT
 import urllib.parse
 
+# Seconds between checks on approval request emails that are still queued
+NOTIFICATION_POLL_SECONDS = 5
+
+
+def show_rvp_notifications():
+    # Delivery status of the approval request emails queued from this session
+    notifications = st.session_state["rvp_notifications"]
+    for notification in notifications:
+        recipient = notification["recipient"]
+        if notification["status"] == "queued":
+            st.info(f"Approval request email to {recipient} is queued for sending.")
+        elif notification["status"] == "sent":
+            st.success(f"Approval request email sent to {recipient}.")
+        else:
+            st.error(f"The approval request email to {recipient} could not be sent: {notification['error']}. "
+                     "Copy the email below and send it through your Outlook client.")
+            st.text_area("Email Content", f"Subject: {notification['subject']}\n\n{notification['body']}",
+                         height=200, key=f"failed_notification_{notification['queued_at']}")
+
+    # Once everything has been sent or given up on, rerun the page so it stops polling
+    if st.session_state.get("rvp_notifications_polling") and \
+            all(notification["status"] != "queued" for notification in notifications):
+        st.session_state["rvp_notifications_polling"] = False
+        st.rerun()
+
+
 def main():
     # Ensure 'unit_id_for_review' and 'is_rvp_approval' are set in session state
     query_params = st.query_params
@@ -28,8 +57,9 @@ def main():
         st.error("No Unit ID found for review. Please ensure you're accessing the correct link.")
         st.stop()
 
-    # Retrieve unit data based on the unit_id
-    unit_data = retrieve_units_data(selected_branch=None, unit_id=unit_id)
+    # Retrieve unit data based on the unit_id, from the primary database so a unit already submitted
+    # or approved is not offered again while the snapshot catches up
+    unit_data = retrieve_units_data(selected_branch=None, unit_id=unit_id, primary=True)
     if unit_data.empty:
         st.error("No details found for the selected Unit ID.")
         st.stop()
@@ -51,8 +81,7 @@ def main():
         st.text_input("**Branch Code**", branch_code, disabled=True)
         wo_number = st.text_input("**WO #**")
         st.text_input("**Customer**", customer, disabled=True)
-        wo_type = st.selectbox("**WO Type**", ["", "Rope Replacement", "Machine/Bear Repair", "Hydro Packing Change",
-                                               "Sheave Replacement", "Other"])
+        wo_type = st.selectbox("**WO Type**", [""] + WO_TYPES)
         description = st.text_area("**Description**")
         st.text_input("**Unit #**", unit_id, disabled=True)
         order_date = st.date_input("**Order Date (YYYY-MM-DD)**")
@@ -96,6 +125,12 @@ def main():
         value_approved = (190.70 * repair_team_hours) if repair_team_hours > 0 else (101.50 * repair_labour_hours)
         st.text_input("**Value Approved**", value=f"{value_approved:.2f}", disabled=True)
 
+        # RVP to notify, when approval requests are emailed from the app
+        if not is_rvp_approval and notifications_enabled():
+            rvp_email = st.selectbox("**RVP to Notify**", sorted(get_rvp_emails()))
+        else:
+            rvp_email = None
+
         submit_button = st.form_submit_button("Submit for RVP Approval" if not is_rvp_approval else "Approve and Submit")
 
     # Handle form submission based on RVP approval status
@@ -141,24 +176,27 @@ def main():
             update_unit_status(unit_id, "Yes")
             st.success("Form has been approved and submitted by the RVP.")
         else:
-            # Generate the email content for manual copy-paste
-            form_link = f"https://canada-care-dashboard-test.streamlit.app/CARE_Form?unit_id={unit_id}&rvp_approval=True"
-            email_subject = "CARE Submission Form Approval Required"
-            email_body = (
-                f"Dear RVP,\n\n"
-                f"Please review and approve the CARE submission form at the following link:\n\n"
-                f"{form_link}\n\n"
-                "Thank you for your attention to this matter.\n\n"
-                "Best regards,\n"
-                "Your Name"
-            )
-
-            # Display the email content in a text area for easy copying
-            st.markdown("### Send Approval Request Email")
-            st.write("To request approval, copy the following email content and paste it into an email to the RVP.")
-            st.text_area("Email Content", f"Subject: {email_subject}\n\n{email_body}", height=200)
-
-            st.success("The email content has been generated. Copy and send it through your Outlook client.")
+            form_link = rvp_form_link(unit_id)
+            if rvp_email:
+                # Queue the approval request; it is sent in the background without holding up the form
+                notification = send_rvp_email(rvp_email, form_link)
+                st.session_state.setdefault("rvp_notifications", []).append(notification)
+            else:
+                # Generate the email content for manual copy-paste
+                email_body = rvp_email_body(form_link, signature="Your Name")
+
+                # Display the email content in a text area for easy copying
+                st.markdown("### Send Approval Request Email")
+                st.write("To request approval, copy the following email content and paste it into an email to the RVP.")
+                st.text_area("Email Content", f"Subject: {RVP_EMAIL_SUBJECT}\n\n{email_body}", height=200)
+
+                st.success("The email content has been generated. Copy and send it through your Outlook client.")
+
+    # Follow the approval request emails until they are sent, so a failed one is not silently dropped
+    if st.session_state.get("rvp_notifications"):
+        polling = any(n["status"] == "queued" for n in st.session_state["rvp_notifications"])
+        st.session_state["rvp_notifications_polling"] = polling
+        st.fragment(show_rvp_notifications, run_every=NOTIFICATION_POLL_SECONDS if polling else None)()
 
 # Call main() to execute the CARE form
 if __name__ == "__main__":
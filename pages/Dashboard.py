@@ -1,5 +1,11 @@
 import streamlit as st
-from scripts.db_utils import get_regions, get_branches, retrieve_units_data
+from scripts.db_utils import get_regions, get_branches, retrieve_units_data, DEFAULT_EXPIRY_WINDOW_MONTHS, \
+    DEFAULT_MAX_DAYS_OUT_OF_SERVICE
+from scripts.export_utils import EXPORT_FORMATS, iter_units_chunks, stream_export, export_file_name, export_bytes, \
+    UNITS_ARROW_SCHEMA, UI_EXPORT_MAX_BYTES
+
+EXPIRY_WINDOW_OPTIONS = [6, 12, 18]
+
 
 def main():
     # Check if the user has provided their email
@@ -15,11 +21,38 @@ def main():
     if region:
         branch = st.sidebar.selectbox("Select Branch", get_branches(region))
 
-    # Retrieve data button
-    if st.sidebar.button("Retrieve Units Data"):
+    # Contract expiry and out of service windows for the units list
+    expiry_months = st.sidebar.selectbox(
+        "Contract Expiry Window", EXPIRY_WINDOW_OPTIONS,
+        index=EXPIRY_WINDOW_OPTIONS.index(DEFAULT_EXPIRY_WINDOW_MONTHS), format_func=lambda m: f"{m} months")
+    max_days_out = st.sidebar.slider("Max Days Out of Service", 1, 365, DEFAULT_MAX_DAYS_OUT_OF_SERVICE)
+    window = (expiry_months, max_days_out)
+
+    # Retrieve data button; changing a window re-runs the query for the branch already on screen
+    retrieve = st.sidebar.button("Retrieve Units Data")
+    if not retrieve and "units_data" in st.session_state and st.session_state.get("units_window") != window:
+        retrieve = st.session_state.get("units_branch") == branch
+    if retrieve:
         if branch:
-            units_data = retrieve_units_data(branch)
+            units_data = retrieve_units_data(branch, expiry_months=expiry_months, max_days_out=max_days_out)
             st.session_state["units_data"] = units_data  # Store units_data in session state
+            st.session_state["units_branch"] = branch
+            st.session_state["units_window"] = window
+
+    # Export the full units list for the selected branch
+    st.sidebar.header("Export")
+    export_format = st.sidebar.selectbox("Export Format", list(EXPORT_FORMATS))
+    if st.sidebar.button("Prepare Units Export"):
+        if branch:
+            file_name, mime = export_file_name(f"CARE_Units_{branch}", export_format)
+            chunks = iter_units_chunks(branch, expiry_months=expiry_months, max_days_out=max_days_out)
+            try:
+                export_data = export_bytes(stream_export(chunks, export_format, UNITS_ARROW_SCHEMA))
+            except ValueError as e:
+                st.sidebar.error(str(e))
+            else:
+                st.sidebar.download_button("Download Units Export", export_data, file_name=file_name, mime=mime)
+    st.sidebar.caption(f"Exports are prepared in memory and limited to {UI_EXPORT_MAX_BYTES // (1024 * 1024)} MB.")
 
     # Retrieve units_data from session state if available
     units_data = st.session_state.get("units_data", None)
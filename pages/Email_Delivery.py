@@ -0,0 +1,40 @@
+import pandas as pd
+import streamlit as st
+from scripts.email_utils import notifications_enabled, get_dispatcher
+
+
+def main():
+    # Check if the user has provided their email
+    if "user_email" not in st.session_state:
+        st.warning("To gain access to the app, you need to first provide your email.")
+        st.stop()  # Stop further execution until the email is provided
+
+    st.title("Approval Request Email Delivery")
+    if not notifications_enabled():
+        st.info("Approval request emails are not sent from the app, as no SMTP server is configured.")
+        st.stop()
+
+    # Delivery report of the background approval request emails, for this app process since it started
+    dispatcher = get_dispatcher()
+    stats = dispatcher.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Emails Sent", stats['sent'])
+    col2.metric("Emails Failed", stats['failed'])
+    col3.metric("Emails Pending", stats['pending'])
+    latency = stats['latency_p90']
+    col4.metric("Delivery Time (p90)", "N/A" if latency is None else f"{latency:.1f} s")
+
+    failures = dispatcher.recent_failures()
+    if failures:
+        st.subheader("Recent Failed Emails")
+        failures = pd.DataFrame(failures)
+        failures['queued_at'] = pd.to_datetime(failures['queued_at'], unit='s').dt.strftime('%Y-%m-%d %H:%M:%S')
+        st.dataframe(failures[['queued_at', 'recipient', 'subject', 'attempts', 'error']], hide_index=True,
+                     use_container_width=True)
+    else:
+        st.write("No failed emails.")
+
+
+# Run main() if this file is executed
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import streamlit as st
+from scripts.db_utils import get_regions, WO_TYPES
+from scripts.export_utils import EXPORT_FORMATS, iter_submissions_chunks, stream_export, export_file_name, export_bytes, \
+    submissions_arrow_schema, UI_EXPORT_MAX_BYTES
+
+
+def main():
+    # Check if the user has provided their email
+    if "user_email" not in st.session_state:
+        st.warning("To gain access to the app, you need to first provide your email.")
+        st.stop()  # Stop further execution until the email is provided
+
+    st.title("Export Approved CARE Submissions")
+    st.caption(
+        f"Exports are prepared in memory and limited to {UI_EXPORT_MAX_BYTES // (1024 * 1024)} MB. "
+        "For larger exports, run `python -m scripts.export_utils submissions`, which streams to a file.")
+
+    # Filters for the CARE_Submissions export, left blank to include everything
+    region = st.selectbox("Region", [""] + get_regions())
+    branch_code = st.text_input("Branch Code").strip()
+    wo_type = st.selectbox("WO Type", [""] + WO_TYPES)
+    filter_dates = st.checkbox("Filter by RVP Approval Date")
+    if filter_dates:
+        approved_from = st.date_input("Approved From (YYYY-MM-DD)")
+        approved_to = st.date_input("Approved To (YYYY-MM-DD)")
+    else:
+        approved_from = None
+        approved_to = None
+    export_format = st.selectbox("Export Format", list(EXPORT_FORMATS))
+
+    if st.button("Prepare Submissions Export"):
+        chunks = iter_submissions_chunks(
+            region=region,
+            branch_code=branch_code,
+            wo_type=wo_type,
+            approved_from=approved_from,
+            approved_to=approved_to,
+        )
+        file_name, mime = export_file_name("CARE_Submissions", export_format)
+        try:
+            export_data = export_bytes(stream_export(chunks, export_format, submissions_arrow_schema()))
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.download_button("Download Submissions Export", export_data, file_name=file_name, mime=mime)
+
+
+# Run main() if this file is executed
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Runs the notification dispatcher with the real SMTP backend against a local SMTP sink and checks
+that a lone request is sent straight away, that the requests following it are sent as per-recipient digests, that temporary failures are retried, and that a
+notification which exhausts its retries is reported as failed.
+
+    python -m scripts.check_notifications
+
+Exits with status 1 if any check fails.
+"""
+import sys
+import time
+
+from scripts.email_utils import NotificationDispatcher, SmtpBackend, RVP_EMAIL_SUBJECT, rvp_email_body, \
+    rvp_form_link
+from scripts.smtp_sink import SmtpSink
+
+
+def check(results, name, condition, detail=""):
+    results.append(condition)
+    print(f"{'PASS' if condition else 'FAIL'}  {name}{f' ({detail})' if detail and not condition else ''}")
+
+
+def run_checks():
+    results = []
+    sink = SmtpSink(port=0).start()
+    dispatcher = NotificationDispatcher(SmtpBackend("127.0.0.1", sink.port, timeout=5),
+                                        digest_window=0.5, max_attempts=3, retry_base_delay=0.05)
+    try:
+        # A lone request goes out straight away, without waiting for the digest window
+        notification = dispatcher.enqueue("rvp-c@example.com", RVP_EMAIL_SUBJECT, "lone request")
+        start = time.time()
+        while notification["status"] == "queued" and time.time() - start < 5:
+            time.sleep(0.01)
+        check(results, "lone request sent before the digest window ends",
+              notification["status"] == "sent" and notification["finished_at"] - notification["queued_at"] < 0.25,
+              f"status {notification['status']}")
+        sink.messages.clear()
+
+        # The first request for an RVP is sent at once; the ones following it within the window make one digest
+        notifications = [
+            dispatcher.enqueue("rvp-a@example.com", RVP_EMAIL_SUBJECT, rvp_email_body(rvp_form_link(unit_id)))
+            for unit_id in ("U1", "U2", "U3")
+        ]
+        notifications.append(
+            dispatcher.enqueue("rvp-b@example.com", RVP_EMAIL_SUBJECT, rvp_email_body(rvp_form_link("U4"))))
+        check(results, "digest batch flushed", dispatcher.flush(timeout=10))
+        subjects = sorted(str(message["Subject"]) for message in sink.messages)
+        check(results, "first request plus one digest for rvp-a, one email for rvp-b", len(sink.messages) == 3,
+              f"got {len(sink.messages)}")
+        check(results, "digest subject counts requests",
+              subjects == sorted([RVP_EMAIL_SUBJECT, RVP_EMAIL_SUBJECT, f"{RVP_EMAIL_SUBJECT} (2 requests)"]),
+              str(subjects))
+        digest = next((m for m in sink.messages if "requests" in str(m["Subject"])), None)
+        check(results, "digest lists the held form links",
+              digest is not None and all(rvp_form_link(u) in digest.get_content() for u in ("U2", "U3")))
+        check(results, "notifications marked sent", all(n["status"] == "sent" for n in notifications),
+              str([n["status"] for n in notifications]))
+
+        # A temporary failure is retried and then delivered
+        time.sleep(dispatcher.digest_window)
+        sink.messages.clear()
+        sink.fail_next = 2
+        notification = dispatcher.enqueue("rvp-a@example.com", RVP_EMAIL_SUBJECT, "retry check")
+        dispatcher.flush(timeout=10)
+        check(results, "retried send delivered", notification["status"] == "sent" and len(sink.messages) == 1,
+              f"status {notification['status']}")
+        check(results, "retry attempts recorded", notification["attempts"] == 3, f"{notification['attempts']}")
+
+        # A notification that exhausts its retries is reported back, not dropped
+        time.sleep(dispatcher.digest_window)
+        sink.fail_next = 3
+        notification = dispatcher.enqueue("rvp-b@example.com", RVP_EMAIL_SUBJECT, "failure check")
+        dispatcher.flush(timeout=10)
+        check(results, "exhausted send marked failed", notification["status"] == "failed",
+              f"status {notification['status']}")
+        check(results, "failure keeps the server error", "451" in (notification["error"] or ""),
+              str(notification["error"]))
+        check(results, "failure listed in recent_failures",
+              [f["body"] for f in dispatcher.recent_failures()] == ["failure check"])
+
+        stats = dispatcher.stats()
+        check(results, "stats count sent and failed", (stats["sent"], stats["failed"]) == (6, 1), str(stats))
+        check(results, "stats report latency", stats["latency_p50"] is not None, str(stats))
+    finally:
+        sink.stop()
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_checks() else 1)
@@ -1,11 +1,33 @@
 import sqlite3
 import pandas as pd
 import os
-from datetime import datetime, timedelta
+import pathlib
+from datetime import datetime
 
 
 # Adjust path to move up one directory and then access the database file
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'CARE_Database.db')
+# CARE_DB_PATH overrides it, e.g. to point several app processes at a primary on a shared volume
+DB_PATH = os.environ.get(
+    'CARE_DB_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'CARE_Database.db'))
+
+# Read replica mode: when CARE_SNAPSHOT_DIR is set, reads go to the latest published snapshot in that
+# directory while writes still go to DB_PATH. Snapshots are published by scripts/snapshot.py.
+SNAPSHOT_DIR = os.environ.get('CARE_SNAPSHOT_DIR')
+SNAPSHOT_POINTER = 'CURRENT'
+SNAPSHOT_MMAP_SIZE = 256 * 1024 * 1024
+
+# Billing frequency multipliers used to annualize the Current Monthly Amount
+FREQUENCY_MULTIPLIERS = {
+    "Monthly": 12,
+    "Bi-Monthly": 6,
+    "Quarterly": 4,
+    "Semi-Annually": 2,
+    "Annually": 1,
+    "Non-Billable": 0
+}
+
+# Work order types offered on the CARE form, and as a filter on the submissions export
+WO_TYPES = ["Rope Replacement", "Machine/Bear Repair", "Hydro Packing Change", "Sheave Replacement", "Other"]
 
 
 def connect_db():
@@ -16,9 +38,83 @@ def connect_db():
         raise  # Reraise to identify the issue if it still occurs
 
 
+def current_snapshot_path(snapshot_dir=None):
+    """Returns the path of the latest published snapshot, or None if replica mode is off or nothing is published."""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if not snapshot_dir:
+        return None
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_POINTER)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(snapshot_dir, name) if name else None
+
+
+def connect_read_db():
+    """
+    Connects for reading. In replica mode this opens the latest snapshot read-only and immutable,
+    so SQLite skips locking entirely and serves pages through mmap; otherwise it is the primary database.
+    """
+    snapshot_path = current_snapshot_path()
+    if snapshot_path is None:
+        return connect_db()
+    uri = f"{pathlib.Path(snapshot_path).resolve().as_uri()}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute(f"PRAGMA mmap_size = {SNAPSHOT_MMAP_SIZE}")
+    return conn
+
+
+def publish_snapshot(snapshot_dir=None, keep=3):
+    """
+    Publishes a consistent read-only copy of the primary database into snapshot_dir.
+    The copy is taken with the SQLite online backup API into a new, uniquely named file, and then
+    swapped in by atomically replacing the pointer file, so readers either see the old snapshot or
+    the new one, never a partial copy. Snapshot files are never modified once published, which is
+    what makes opening them with immutable=1 safe. Older snapshots beyond keep are removed.
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if not snapshot_dir:
+        raise ValueError("No snapshot directory given and CARE_SNAPSHOT_DIR is not set")
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    name = f"CARE_Database_{datetime.now():%Y%m%d_%H%M%S_%f}.db"
+    snapshot_path = os.path.join(snapshot_dir, name)
+    temp_path = snapshot_path + '.tmp'
+
+    # Snapshots are read-only, so make sure the window buckets are filled in before copying
+    refresh_window_buckets()
+
+    source = connect_db()
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, snapshot_path)
+
+    pointer_path = os.path.join(snapshot_dir, SNAPSHOT_POINTER)
+    with open(pointer_path + '.tmp', 'w') as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_path + '.tmp', pointer_path)
+
+    # Remove old snapshots; ones still open by a reader (e.g. on Windows) are left for the next run
+    snapshots = sorted(f for f in os.listdir(snapshot_dir) if f.startswith('CARE_Database_') and f.endswith('.db'))
+    for old_name in snapshots[:-max(keep, 1)]:
+        try:
+            os.remove(os.path.join(snapshot_dir, old_name))
+        except OSError as e:
+            print(f"Could not remove old snapshot {old_name}: {e}")
+
+    return snapshot_path
+
+
 def get_regions():
     """Fetches a list of unique regions from the Canada_Hierarchy table."""
-    with connect_db() as conn:
+    with connect_read_db() as conn:
         query = "SELECT DISTINCT Region FROM Canada_Hierarchy ORDER BY Region ASC;"
         regions = [row[0] for row in conn.execute(query).fetchall()]
     return regions
@@ -26,7 +122,7 @@ def get_regions():
 
 def get_branches(selected_region):
     """Fetches a list of branches for a specified region from the Canada_Hierarchy table."""
-    with connect_db() as conn:
+    with connect_read_db() as conn:
         query = """
             SELECT DISTINCT `Parent Branch`
             FROM Canada_Hierarchy
@@ -39,7 +135,7 @@ def get_branches(selected_region):
 
 def get_branch_code(branch_name):
     # Connect to the database using the existing function
-    conn = connect_db()
+    conn = connect_read_db()
     cursor = conn.cursor()
 
     # Query the Branch Code from Canada_Hierarchy table
@@ -54,16 +150,167 @@ def get_branch_code(branch_name):
 
 def get_rvp_emails():
     """Fetch the list of RVP emails from the Canada_RVPs table."""
-    conn = connect_db()  # Use the already defined connection function
+    conn = connect_read_db()  # Use the already defined connection function
     cursor = conn.cursor()
     cursor.execute("SELECT email FROM Canada_RVPs")
     rvps = cursor.fetchall()
     conn.close()
-    # Print retrieved emails for debugging
-    print("Retrieved RVP emails:", rvps)
     # Return a set of emails for faster lookup
     return {row[0] for row in rvps}
 
+# Monthly approval totals per region, branch and WO type, kept up to date as each submission is approved.
+# Turnaround is stored as a sum and a count so averages can be combined across rows.
+APPROVAL_AGGREGATES_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS CARE_Approvals_Monthly (
+    month TEXT NOT NULL,
+    region TEXT NOT NULL,
+    branch_code TEXT NOT NULL,
+    wo_type TEXT NOT NULL,
+    approvals INTEGER NOT NULL,
+    value_approved REAL NOT NULL,
+    repair_team_hours REAL NOT NULL,
+    repair_labour_hours REAL NOT NULL,
+    turnaround_count INTEGER NOT NULL,
+    turnaround_days REAL NOT NULL,
+    PRIMARY KEY (month, region, branch_code, wo_type)
+)
+"""
+
+# The aggregates as computed from scratch, used to build the table and to read a database that doesn't have it yet
+APPROVAL_AGGREGATES_SELECT = """
+SELECT
+    COALESCE(substr(rvp_approval_date, 1, 7), '') AS month,
+    COALESCE(region, '') AS region,
+    COALESCE(branch_code, '') AS branch_code,
+    COALESCE(wo_type, '') AS wo_type,
+    COUNT(*) AS approvals,
+    COALESCE(SUM(value_approved), 0) AS value_approved,
+    COALESCE(SUM(repair_team_hours), 0) AS repair_team_hours,
+    COALESCE(SUM(repair_labour_hours), 0) AS repair_labour_hours,
+    COUNT(julianday(rvp_approval_date) - julianday(dm_approval_date)) AS turnaround_count,
+    COALESCE(SUM(julianday(rvp_approval_date) - julianday(dm_approval_date)), 0) AS turnaround_days
+FROM CARE_Submissions
+GROUP BY 1, 2, 3, 4
+"""
+
+SUBMISSIONS_APPROVAL_INDEX_QUERY = """
+CREATE INDEX IF NOT EXISTS idx_submissions_region_branch_approval
+ON CARE_Submissions (region, branch_code, rvp_approval_date)
+"""
+
+
+def create_approval_aggregates(cursor):
+    """
+    Creates the approval aggregates table and the CARE_Submissions approval index if they don't exist.
+    When the aggregates table is new, it is backfilled from the submissions already approved.
+    """
+    has_aggregates = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CARE_Approvals_Monthly'").fetchone()
+    cursor.execute(APPROVAL_AGGREGATES_TABLE_QUERY)
+    cursor.execute(SUBMISSIONS_APPROVAL_INDEX_QUERY)
+    if not has_aggregates:
+        rebuild_approval_aggregates(cursor)
+
+
+def rebuild_approval_aggregates(cursor):
+    """Recomputes the approval aggregates from the full CARE_Submissions table."""
+    cursor.execute("DELETE FROM CARE_Approvals_Monthly")
+    cursor.execute(f"""
+        INSERT INTO CARE_Approvals_Monthly (
+            month, region, branch_code, wo_type, approvals, value_approved, repair_team_hours,
+            repair_labour_hours, turnaround_count, turnaround_days
+        )
+        {APPROVAL_AGGREGATES_SELECT}
+    """)
+
+
+def ensure_approval_aggregates():
+    """
+    Creates and backfills the approval aggregates on the primary database the first time they are read,
+    for databases that had approved submissions before the aggregates table existed.
+    Returns False if the database is busy; the aggregates are then computed from CARE_Submissions on read.
+    """
+    conn = connect_db()
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'CARE_Approvals_Monthly' in tables or 'CARE_Submissions' not in tables:
+            return True
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        create_approval_aggregates(cursor)
+        conn.commit()
+        return True
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        print(f"Approval aggregates were not created: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def add_to_approval_aggregates(cursor, form_data):
+    """Adds one approved submission to its month's aggregates row, on the caller's transaction."""
+    rvp_approval_date = form_data["rvp_approval_date"] or ""
+    turnaround_days = None
+    if form_data["rvp_approval_date"] and form_data["dm_approval_date"]:
+        turnaround_days = (datetime.strptime(form_data["rvp_approval_date"], '%Y-%m-%d')
+                           - datetime.strptime(form_data["dm_approval_date"], '%Y-%m-%d')).days
+
+    cursor.execute("""
+        INSERT INTO CARE_Approvals_Monthly (
+            month, region, branch_code, wo_type, approvals, value_approved, repair_team_hours,
+            repair_labour_hours, turnaround_count, turnaround_days
+        ) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (month, region, branch_code, wo_type) DO UPDATE SET
+            approvals = approvals + 1,
+            value_approved = value_approved + excluded.value_approved,
+            repair_team_hours = repair_team_hours + excluded.repair_team_hours,
+            repair_labour_hours = repair_labour_hours + excluded.repair_labour_hours,
+            turnaround_count = turnaround_count + excluded.turnaround_count,
+            turnaround_days = turnaround_days + excluded.turnaround_days
+    """, (
+        rvp_approval_date[:7],
+        form_data["region"] or "",
+        form_data["branch_code"] or "",
+        form_data["wo_type"] or "",
+        form_data["value_approved"] or 0,
+        form_data["repair_team_hours"] or 0,
+        form_data["repair_labour_hours"] or 0,
+        0 if turnaround_days is None else 1,
+        turnaround_days or 0,
+    ))
+
+
+def get_approval_analytics(region=None, branch_code=None):
+    """
+    Fetches the monthly approval aggregates, optionally for one region and/or branch code.
+    If the aggregates table hasn't been created yet (or a snapshot predates it), the same rows are
+    computed from CARE_Submissions. An empty frame means nothing matching has been approved.
+    """
+    if current_snapshot_path() is None:
+        ensure_approval_aggregates()
+
+    with connect_read_db() as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'CARE_Approvals_Monthly' in tables:
+            source = "CARE_Approvals_Monthly"
+        elif 'CARE_Submissions' in tables:
+            source = f"({APPROVAL_AGGREGATES_SELECT})"
+        else:
+            return pd.DataFrame()
+
+        query = f"SELECT * FROM {source} WHERE 1 = 1"
+        params = []
+        if region:
+            query += " AND region = ?"
+            params.append(region)
+        if branch_code:
+            query += " AND branch_code = ?"
+            params.append(branch_code)
+        query += " ORDER BY month, region, branch_code, wo_type"
+        return pd.read_sql_query(query, conn, params=params)
+
+
 def save_to_care_submissions(form_data):
     # Define SQL to create the CARE_Submissions table if it doesn’t exist
     create_table_query = """
@@ -112,15 +359,19 @@ def save_to_care_submissions(form_data):
         customer_visit_date, dm_approval_date, approval_by_dm, dm_notes, 
         rvp_approval_date, approval_by_rvp, repair_team_hours, repair_labour_hours,
         notes, value_approved
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """
 
     # Connect to the database and execute the queries
     conn = connect_db()
     cursor = conn.cursor()
 
-    # Create the table if it doesn't exist
+    # Take the write lock up front so the submission and its aggregates commit as one transaction
+    cursor.execute("BEGIN IMMEDIATE")
+
+    # Create the table and its approval aggregates if they don't exist
     cursor.execute(create_table_query)
+    create_approval_aggregates(cursor)
 
     # Insert form data into the table
     cursor.execute(insert_data_query, (
@@ -157,6 +408,9 @@ def save_to_care_submissions(form_data):
         form_data["value_approved"]
     ))
 
+    # Update the monthly aggregates in the same transaction, so they always match the submissions
+    add_to_approval_aggregates(cursor, form_data)
+
     # Commit and close the connection
     conn.commit()
     conn.close()
@@ -323,7 +577,7 @@ def retrieve_pending_submission(unit_id):
 
 def get_top20_customers(selected_branch):
     """Calculates and returns a set of the top 20 customers by annual revenue for a specific branch."""
-    with connect_db() as conn:
+    with connect_read_db() as conn:
         query = """
             SELECT 
                 CC.Customer,
@@ -334,21 +588,11 @@ def get_top20_customers(selected_branch):
         """
         contracts_df = pd.read_sql_query(query, conn, params=(selected_branch,))
 
-    # Define billing frequency multipliers
-    frequency_multipliers = {
-        "Monthly": 12,
-        "Bi-Monthly": 6,
-        "Quarterly": 4,
-        "Semi-Annually": 2,
-        "Annually": 1,
-        "Non-Billable": 0
-    }
-
     # Calculate Annual Value for each contract
     contracts_df['Current Monthly Amount'] = pd.to_numeric(
         contracts_df['Current Monthly Amount'].replace(r'[\$,]', '', regex=True), errors='coerce').fillna(0)
     contracts_df['Annual Value'] = contracts_df.apply(
-        lambda x: x['Current Monthly Amount'] * frequency_multipliers.get(x['Billing Frequency'], 0), axis=1)
+        lambda x: x['Current Monthly Amount'] * FREQUENCY_MULTIPLIERS.get(x['Billing Frequency'], 0), axis=1)
 
     # Aggregate the annual value by customer
     top_customers = contracts_df.groupby('Customer')['Annual Value'].sum().reset_index()
@@ -357,92 +601,266 @@ def get_top20_customers(selected_branch):
     return set(top_customers['Customer'])
 
 
-def retrieve_units_data(selected_branch=None, unit_id=None):
+# Default windows for the branch units list; both can be changed at runtime from the Dashboard
+DEFAULT_EXPIRY_WINDOW_MONTHS = 12
+DEFAULT_MAX_DAYS_OUT_OF_SERVICE = 60
+
+# Precomputed bucket columns behind the units list windows: (table, source column, bucket column, format)
+WINDOW_BUCKETS = [
+    ("Canada_Contracts", "Expiration Date", "Expiry Month", "%Y-%m"),
+    ("Units_Out_Of_Service", "Out of Service Date", "OOS Date", "%Y-%m-%d"),
+]
+# Indexes for the window range conditions, plus the join keys so the planner looks contracts up by
+# number instead of scanning every contract in the expiry range for each unit. The single column
+# bucket indexes also serve the IS NULL checks for rows that still need a bucket.
+UNITS_QUERY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_contracts_expiry_month ON Canada_Contracts (`Expiry Month`)",
+    "CREATE INDEX IF NOT EXISTS idx_units_oos_date ON Units_Out_Of_Service (`OOS Date`)",
+    "CREATE INDEX IF NOT EXISTS idx_units_branch_oos_date "
+    "ON Units_Out_Of_Service (Branch, `CARE Submission`, `OOS Date`)",
+    "CREATE INDEX IF NOT EXISTS idx_canada_units_serial ON Canada_Units (`Serial Number`)",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_number ON Canada_Contracts (`Contract #`)",
+    "CREATE INDEX IF NOT EXISTS idx_routes_route ON Routes (Route)",
+]
+
+# How long a units read waits for the write lock when it finds buckets to fill in, before it gives up
+# and runs on the existing buckets; the bulk of the refreshing belongs to the import and snapshot steps
+REQUEST_REFRESH_LOCK_TIMEOUT_SECONDS = 1
+
+UNITS_COLUMNS = ['Branch', 'Address', 'Customer', 'Top 20 Customer', 'Contract Expiry Date', 'Annual Value',
+                 'Contract #', 'Unit ID', 'Salesperson', 'Supervisor', 'TAC Controller', 'Days Out of Service']
+
+
+def _bucket_trigger_names(table, bucket_column):
+    name = f"trg_{table}_{bucket_column.replace(' ', '_')}".lower()
+    return name + "_insert", name + "_update"
+
+
+def _missing_bucket_triggers(conn):
+    # Bucket tables whose invalidation triggers are gone, e.g. because an import recreated the table
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    return [
+        (table, source_column, bucket_column, bucket_format)
+        for table, source_column, bucket_column, bucket_format in WINDOW_BUCKETS
+        if not set(_bucket_trigger_names(table, bucket_column)) <= triggers
+    ]
+
+
+def refresh_window_buckets(lock_timeout=None):
     """
-    Retrieves and filters units data based on the selected branch or specific unit ID.
-    If a unit_id is provided, retrieves details for that specific unit only.
+    Fills in the precomputed Expiry Month (YYYY-MM) and OOS Date (YYYY-MM-DD) columns that the units
+    list windows filter on, adding the columns and the units query indexes first if they don't exist yet.
+    Triggers reset a bucket to NULL whenever its row is inserted or its date is changed, so only rows
+    without a bucket are parsed here and this is cheap to run again after rows are imported or edited.
+    When the triggers are first created every bucket in the table is recomputed.
+    Dates that cannot be parsed get an empty bucket and never fall inside a window.
+    Run it after every import (python -m scripts.refresh_buckets); publish_snapshot runs it too.
+    With lock_timeout, sqlite3.OperationalError is raised if the write lock isn't free within that many seconds.
     """
-    with connect_db() as conn:
-        # Modify query to filter by branch and optionally by a specific unit ID
-        query = """
-            SELECT 
-                UOS.Branch,
-                UOS.`Serial Number` AS `Unit ID`,
-                UOS.`Building Address` AS Address,
-                UOS.`Building Salesperson` AS Salesperson,
-                UOS.`Out of Service Date` AS `Out of Service Date`,
-                UOS.`Route`,
-                UOS.`CARE Submission`,
-                CU.`Contract Number` AS `Contract #`,
-                CU.`Controller Name` AS `Controller Name`,
-                CC.Customer,
-                CC.`Expiration Date` AS `Contract Expiry Date`,
-                CC.`Current Monthly Amount`,
-                CC.`Billing Frequency`,
-                R.Supervisor AS `Supervisor`
-            FROM Units_Out_Of_Service AS UOS
-            LEFT JOIN Canada_Units AS CU ON UOS.`Serial Number` = CU.`Serial Number`
-            LEFT JOIN Canada_Contracts AS CC ON CU.`Contract Number` = CC.`Contract #`
-            LEFT JOIN Routes AS R ON UOS.`Route` = R.`Route`
-            WHERE UOS.`CARE Submission` = 'No'
-        """
+    conn = connect_db()
+    try:
+        if lock_timeout is not None:
+            conn.execute(f"PRAGMA busy_timeout = {int(lock_timeout * 1000)}")
+        conn.execute("BEGIN IMMEDIATE")
+        missing_triggers = _missing_bucket_triggers(conn)
+        for table, source_column, bucket_column, bucket_format in WINDOW_BUCKETS:
+            columns = [column[1] for column in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+            if bucket_column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN `{bucket_column}` TEXT")
+
+            if (table, source_column, bucket_column, bucket_format) in missing_triggers:
+                insert_trigger, update_trigger = _bucket_trigger_names(table, bucket_column)
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {insert_trigger} AFTER INSERT ON {table}
+                    WHEN NEW.`{bucket_column}` IS NOT NULL
+                    BEGIN
+                        UPDATE {table} SET `{bucket_column}` = NULL WHERE rowid = NEW.rowid;
+                    END
+                """)
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {update_trigger} AFTER UPDATE OF `{source_column}` ON {table}
+                    WHEN NEW.`{source_column}` IS NOT OLD.`{source_column}`
+                    BEGIN
+                        UPDATE {table} SET `{bucket_column}` = NULL WHERE rowid = NEW.rowid;
+                    END
+                """)
+                # Buckets written before the triggers existed may be stale
+                conn.execute(f"UPDATE {table} SET `{bucket_column}` = NULL")
+
+            rows = conn.execute(
+                f"SELECT rowid, `{source_column}` FROM {table} WHERE `{bucket_column}` IS NULL").fetchall()
+            if rows:
+                rowids, values = zip(*rows)
+                buckets = pd.to_datetime(pd.Series(values), errors='coerce').dt.strftime(bucket_format).fillna('')
+                conn.executemany(
+                    f"UPDATE {table} SET `{bucket_column}` = ? WHERE rowid = ?", zip(buckets, rowids))
+
+        for index_query in UNITS_QUERY_INDEXES:
+            conn.execute(index_query)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def window_bucket_columns_exist(conn):
+    """Checks whether every bucket column has been added; a fresh or just imported table has none."""
+    for table, _, bucket_column, _ in WINDOW_BUCKETS:
+        columns = [column[1] for column in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if bucket_column not in columns:
+            return False
+    return True
 
-        # Set up parameters based on whether branch or unit_id is provided
-        params = []
-        if selected_branch:
-            query += " AND UOS.Branch = ?"
-            params.append(selected_branch)
-        if unit_id:
-            query += " AND UOS.`Serial Number` = ?"
-            params.append(unit_id)
 
+def window_buckets_pending(conn):
+    """
+    Checks whether refresh_window_buckets has work to do: a bucket column or trigger is missing (a fresh
+    database, or a table recreated by an import) or some rows have no bucket yet. Uses indexed lookups only.
+    """
+    if _missing_bucket_triggers(conn) or not window_bucket_columns_exist(conn):
+        return True
+    for table, _, bucket_column, _ in WINDOW_BUCKETS:
+        if conn.execute(f"SELECT 1 FROM {table} WHERE `{bucket_column}` IS NULL LIMIT 1").fetchone():
+            return True
+    return False
+
+
+def ensure_window_buckets():
+    """
+    Checks the window buckets of the primary database before a units query runs against it, and returns
+    whether the query can use the bucket columns. When the import step has refreshed them this is only a
+    cheap read. If rows still need a bucket, a refresh is tried, but it waits at most
+    REQUEST_REFRESH_LOCK_TIMEOUT_SECONDS for the write lock; if it can't get it, the query runs on the
+    existing buckets, leaving rows without one out of the branch windows until the next refresh.
+    False means the bucket columns don't exist yet, and the query has to parse the source dates itself.
+    Snapshots are refreshed when they are published, so this is not needed when reading one.
+    """
+    conn = connect_db()
+    try:
+        pending = window_buckets_pending(conn)
+        columns_exist = window_bucket_columns_exist(conn)
+    finally:
+        conn.close()
+    if not pending:
+        return True
+    try:
+        refresh_window_buckets(lock_timeout=REQUEST_REFRESH_LOCK_TIMEOUT_SECONDS)
+    except sqlite3.OperationalError as e:
+        print(f"Window buckets were not refreshed, using the existing ones: {e}")
+        return columns_exist
+    return True
+
+
+def build_units_query(selected_branch=None, unit_id=None, expiry_months=DEFAULT_EXPIRY_WINDOW_MONTHS,
+                      max_days_out=DEFAULT_MAX_DAYS_OUT_OF_SERVICE, as_of=None, page_key=None, use_buckets=True):
+    """
+    Builds the units out of service query and its parameters for a branch and/or a specific unit ID.
+    For a branch units list, only contracts expiring within expiry_months of as_of (today by default)
+    and units out of service for fewer than max_days_out days are returned. Both are range conditions
+    on the precomputed bucket columns (see refresh_window_buckets), so they are served by indexes.
+    Callers reading the primary database run ensure_window_buckets first, and pass use_buckets=False if
+    the bucket columns don't exist yet; the windows are then computed from the source dates, unindexed.
+    If page_key is given, the Units_Out_Of_Service rowid is also selected under that name, for paged exports.
+    """
+    as_of = pd.Timestamp(as_of or datetime.today()).normalize()
+    if use_buckets:
+        oos_date, expiry_month = "UOS.`OOS Date`", "CC.`Expiry Month`"
+    else:
+        oos_date, expiry_month = "date(UOS.`Out of Service Date`)", "strftime('%Y-%m', CC.`Expiration Date`)"
+    query = f"""
+        SELECT 
+            UOS.Branch,
+            UOS.`Serial Number` AS `Unit ID`,
+            UOS.`Building Address` AS Address,
+            UOS.`Building Salesperson` AS Salesperson,
+            UOS.`Out of Service Date` AS `Out of Service Date`,
+            CAST(julianday(?) - julianday({oos_date}) AS INTEGER) AS `Days Out of Service`,
+            UOS.`Route`,
+            UOS.`CARE Submission`,
+            CU.`Contract Number` AS `Contract #`,
+            CU.`Controller Name` AS `Controller Name`,
+            CC.Customer,
+            CC.`Expiration Date` AS `Contract Expiry Date`,
+            CC.`Current Monthly Amount`,
+            CC.`Billing Frequency`,
+            R.Supervisor AS `Supervisor`
+        FROM Units_Out_Of_Service AS UOS
+        LEFT JOIN Canada_Units AS CU ON UOS.`Serial Number` = CU.`Serial Number`
+        LEFT JOIN Canada_Contracts AS CC ON CU.`Contract Number` = CC.`Contract #`
+        LEFT JOIN Routes AS R ON UOS.`Route` = R.`Route`
+        WHERE UOS.`CARE Submission` = 'No'
+    """
+    if page_key:
+        query = query.replace("SELECT", f"SELECT UOS.rowid AS {page_key},", 1)
+
+    # Set up parameters based on whether branch or unit_id is provided
+    params = [as_of.strftime('%Y-%m-%d')]
+    if selected_branch:
+        query += " AND UOS.Branch = ?"
+        params.append(selected_branch)
+    if unit_id:
+        query += " AND UOS.`Serial Number` = ?"
+        params.append(unit_id)
+
+    # Apply the expiry and out of service windows to a branch units list
+    if selected_branch and not unit_id:
+        expiry_cutoff = as_of + pd.DateOffset(months=expiry_months)
+        oos_cutoff = as_of - pd.Timedelta(days=max_days_out)
+        query += f" AND {expiry_month} > '' AND {expiry_month} <= ? AND {oos_date} > ?"
+        params.extend([expiry_cutoff.strftime('%Y-%m'), oos_cutoff.strftime('%Y-%m-%d')])
+
+    return query, params
+
+
+def transform_units_data(df, top20_customers):
+    """
+    Applies the branch units list derived columns to a frame returned by the units query.
+    Works row-wise only, so it can be applied to a whole result set or to one chunk of it at a time.
+    """
+    # Convert Contract Expiry Date to datetime for display
+    df['Contract Expiry Date'] = pd.to_datetime(df['Contract Expiry Date'], errors='coerce')
+
+    # Ensure Contract # is an integer
+    df['Contract #'] = pd.to_numeric(df['Contract #'], errors='coerce').fillna(0).astype(int)
+
+    # Add TAC Controller column based on "Controller Name" containing "TAC"
+    df['TAC Controller'] = df['Controller Name'].apply(lambda x: "✅" if "TAC" in str(x) else "")
+
+    # Calculate Annual Value based on Current Monthly Amount and Billing Frequency
+    df['Current Monthly Amount'] = pd.to_numeric(df['Current Monthly Amount'].replace(r'[\$,]', '', regex=True),
+                                                 errors='coerce').fillna(0)
+    df['Annual Value'] = df['Current Monthly Amount'] * df['Billing Frequency'].map(FREQUENCY_MULTIPLIERS).fillna(0)
+
+    # Flag the top 20 customers for the branch
+    df['Top 20 Customer'] = df['Customer'].apply(lambda x: "✅" if x in top20_customers else "")
+
+    # Format Annual Value as currency
+    df['Annual Value'] = df['Annual Value'].apply(lambda x: "${:,.2f}".format(x))
+
+    # Reorder columns to the specified order
+    return df[UNITS_COLUMNS]
+
+
+def retrieve_units_data(selected_branch=None, unit_id=None, expiry_months=DEFAULT_EXPIRY_WINDOW_MONTHS,
+                        max_days_out=DEFAULT_MAX_DAYS_OUT_OF_SERVICE, primary=False):
+    """
+    Retrieves and filters units data based on the selected branch or specific unit ID.
+    If a unit_id is provided, retrieves details for that specific unit only.
+    Reads the snapshot replica when one is published, unless primary is set; use primary for lookups
+    that gate a write, since the snapshot can still list a unit that has already been submitted.
+    """
+    use_buckets = True
+    if primary or current_snapshot_path() is None:
+        use_buckets = ensure_window_buckets()
+    query, params = build_units_query(selected_branch, unit_id, expiry_months, max_days_out,
+                                      use_buckets=use_buckets)
+    with (connect_db() if primary else connect_read_db()) as conn:
         df = pd.read_sql_query(query, conn, params=params)
 
     # Perform additional transformations if we're getting all units for a branch
     if selected_branch and not unit_id:
-        # Convert Contract Expiry Date to datetime and apply a 13-month cutoff
-        df['Contract Expiry Date'] = pd.to_datetime(df['Contract Expiry Date'], errors='coerce')
-        comparison_date = datetime(2024, 10, 1)
-        cutoff_date = comparison_date + timedelta(days=13 * 30)  # approx. 13 months
-        df = df[df['Contract Expiry Date'] <= cutoff_date]
-
-        # Parse Out of Service Date and calculate days out of service
-        df['Out of Service Date'] = pd.to_datetime(df['Out of Service Date'], errors='coerce')
-        today = datetime.today()
-        df['Days Out of Service'] = (today - df['Out of Service Date']).dt.days
-
-        # Filter out units that have been out of service for 60 days or more
-        df = df[df['Days Out of Service'] < 60]
-
-        # Ensure Contract # is an integer
-        df['Contract #'] = pd.to_numeric(df['Contract #'], errors='coerce').fillna(0).astype(int)
-
-        # Add TAC Controller column based on "Controller Name" containing "TAC"
-        df['TAC Controller'] = df['Controller Name'].apply(lambda x: "✅" if "TAC" in str(x) else "")
-
-        # Calculate Annual Value based on Current Monthly Amount and Billing Frequency
-        frequency_multipliers = {
-            "Monthly": 12,
-            "Bi-Monthly": 6,
-            "Quarterly": 4,
-            "Semi-Annually": 2,
-            "Annually": 1,
-            "Non-Billable": 0
-        }
-        df['Current Monthly Amount'] = pd.to_numeric(df['Current Monthly Amount'].replace(r'[\$,]', '', regex=True),
-                                                     errors='coerce').fillna(0)
-        df['Annual Value'] = df.apply(
-            lambda x: x['Current Monthly Amount'] * frequency_multipliers.get(x['Billing Frequency'], 0), axis=1)
-
-        # Get top 20 customers for the branch
-        top20_customers = get_top20_customers(selected_branch)
-        df['Top 20 Customer'] = df['Customer'].apply(lambda x: "✅" if x in top20_customers else "")
-
-        # Format Annual Value as currency
-        df['Annual Value'] = df['Annual Value'].apply(lambda x: "${:,.2f}".format(x))
-
-        # Reorder columns to the specified order
-        df = df[['Branch', 'Address', 'Customer', 'Top 20 Customer', 'Contract Expiry Date', 'Annual Value',
-                 'Contract #', 'Unit ID', 'Salesperson', 'Supervisor', 'TAC Controller', 'Days Out of Service']]
+        df = transform_units_data(df, get_top20_customers(selected_branch))
 
     return df
@@ -1,25 +1,267 @@
-import win32com.client as win32
-import pythoncom
+import os
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+
 import streamlit as st
 
 
+# Notification settings. With no SMTP host configured the app falls back to showing the email for copy-paste.
+# Queued notifications are held in memory by the app process only: anything not yet sent when Streamlit
+# restarts is lost without a trace, even though the DM was told it was queued, so after a restart DMs should
+# check with the RVP or fall back to sending the email themselves.
+# For local testing, run the stand-in server in scripts/smtp_sink.py (`python -m scripts.smtp_sink --port 1025`)
+# and set CARE_SMTP_HOST=localhost and CARE_SMTP_PORT=1025. `python -m scripts.check_notifications` runs the
+# dispatcher against it and checks digests, retries and failure reporting.
+SMTP_HOST = os.environ.get("CARE_SMTP_HOST")
+SMTP_PORT = int(os.environ.get("CARE_SMTP_PORT", "25"))
+SMTP_USERNAME = os.environ.get("CARE_SMTP_USERNAME")
+SMTP_PASSWORD = os.environ.get("CARE_SMTP_PASSWORD")
+SMTP_STARTTLS = os.environ.get("CARE_SMTP_STARTTLS", "false").lower() == "true"
+MAIL_FROM = os.environ.get("CARE_MAIL_FROM", "care-dashboard@localhost")
+APP_URL = os.environ.get("CARE_APP_URL", "https://canada-care-dashboard-test.streamlit.app")
+
+# A request for an RVP who hasn't been emailed in this many seconds is sent straight away; further requests
+# for them within the window are held and sent together as one digest when it ends
+DIGEST_WINDOW_SECONDS = float(os.environ.get("CARE_DIGEST_WINDOW_SECONDS", "30"))
+MAX_SEND_ATTEMPTS = 4
+RETRY_BASE_DELAY_SECONDS = 2.0
+# Notifications that exhausted their retries, kept for the Email Delivery page
+MAX_RECENT_FAILURES = 50
+
+RVP_EMAIL_SUBJECT = "CARE Submission Form Approval Required"
+
+
+def rvp_form_link(unit_id):
+    """Returns the link an RVP follows to review and approve the CARE form for a unit."""
+    return f"{APP_URL}/CARE_Form?unit_id={unit_id}&rvp_approval=True"
+
+
+def rvp_email_body(form_link, signature="C.A.R.E Dashboard"):
+    return (
+        f"Dear RVP,\n\n"
+        f"Please review and approve the CARE submission form at the following link:\n\n"
+        f"{form_link}\n\n"
+        "Thank you for your attention to this matter.\n\n"
+        "Best regards,\n"
+        f"{signature}"
+    )
+
+
+def notifications_enabled():
+    """Notifications are sent only when an SMTP host is configured."""
+    return bool(SMTP_HOST)
+
+
+class SmtpBackend:
+    """Sends notifications through an SMTP server, one connection per message."""
+
+    def __init__(self, host, port=25, username=None, password=None, use_starttls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_starttls = use_starttls
+        self.timeout = timeout
+
+    def send(self, message):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as server:
+            if self.use_starttls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+            server.send_message(message)
+
+
+class ConsoleBackend:
+    """Prints notifications instead of sending them, for development without a mail server."""
+
+    def send(self, message):
+        print(f"Notification to {message['To']}: {message['Subject']}\n{message.get_content()}")
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications from a background thread so callers never wait on the mail server.
+    The first notification for a recipient is sent right away; any that follow within digest_window
+    seconds of it are held and sent as one digest at the end of the window, so an RVP gets one email
+    for a burst of requests without a lone request being delayed. Failed sends are retried with exponential backoff, and the
+    time from enqueue to delivery is recorded for each notification. Delivery counters and latencies are
+    printed after every batch, and notifications that could not be sent are kept in recent_failures().
+    """
+
+    def __init__(self, backend, sender=MAIL_FROM, digest_window=DIGEST_WINDOW_SECONDS,
+                 max_attempts=MAX_SEND_ATTEMPTS, retry_base_delay=RETRY_BASE_DELAY_SECONDS):
+        self.backend = backend
+        self.sender = sender
+        self.digest_window = digest_window
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._failures = deque(maxlen=MAX_RECENT_FAILURES)
+        self._sent = 0
+        self._failed = 0
+        self._worker = threading.Thread(target=self._run, name="NotificationDispatcher", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, recipient, subject, body):
+        """
+        Queues a notification and returns immediately. The returned dict is updated once delivery is over:
+        status goes from 'queued' to 'sent' or 'failed', with the last error kept in error.
+        """
+        notification = {"recipient": recipient, "subject": subject, "body": body, "queued_at": time.time(),
+                        "status": "queued", "attempts": 0, "error": None}
+        self._queue.put(notification)
+        return notification
+
+    def stats(self):
+        """Returns delivery counters and latency percentiles in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sent, failed = self._sent, self._failed
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        return {
+            "sent": sent,
+            "failed": failed,
+            "pending": self._queue.unfinished_tasks,
+            "latency_p50": percentile(0.50),
+            "latency_p90": percentile(0.90),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+    def recent_failures(self):
+        """Returns copies of the latest notifications that could not be sent, oldest first."""
+        with self._lock:
+            return [dict(notification) for notification in self._failures]
+
+    def flush(self, timeout=None):
+        """Waits until everything queued so far has been sent or given up on."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _run(self):
+        held = {}  # Recipient -> (time the held notifications are due, notifications)
+        last_sent = {}  # Recipient -> time of the last email to them
+        while True:
+            now = time.time()
+            due = [recipient for recipient, (due_at, _) in held.items() if due_at <= now]
+            if not due:
+                timeout = min(due_at for due_at, _ in held.values()) - now if held else None
+                try:
+                    notification = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                recipient = notification["recipient"]
+                if recipient in held:
+                    held[recipient][1].append(notification)
+                else:
+                    # Straight away, unless the recipient was emailed within the digest window
+                    held[recipient] = (last_sent.get(recipient, 0) + self.digest_window, [notification])
+                continue
+
+            for recipient in due:
+                _, notifications = held.pop(recipient)
+                try:
+                    self._deliver(recipient, notifications)
+                except Exception as e:
+                    print(f"Unexpected error delivering notifications to {recipient}: {e}")
+                    self._finish(notifications, "failed", error=str(e))
+                last_sent[recipient] = time.time()
+
+                stats = self.stats()
+                print(f"Notification batch of {len(notifications)} done: {stats['sent']} sent, "
+                      f"{stats['failed']} failed, {stats['pending'] - len(notifications)} pending; "
+                      f"latency p50 {_seconds(stats['latency_p50'])}, p90 {_seconds(stats['latency_p90'])}, "
+                      f"max {_seconds(stats['latency_max'])}")
+                for _ in notifications:
+                    self._queue.task_done()
+
+    def _build_message(self, recipient, notifications):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        if len(notifications) == 1:
+            message["Subject"] = notifications[0]["subject"]
+            message.set_content(notifications[0]["body"])
+        else:
+            subjects = {n["subject"] for n in notifications}
+            subject = subjects.pop() if len(subjects) == 1 else "CARE Notifications"
+            message["Subject"] = f"{subject} ({len(notifications)} requests)"
+            sections = [f"{n['subject']}\n\n{n['body']}" for n in notifications]
+            message.set_content(f"\n\n{'-' * 40}\n\n".join(sections))
+        return message
+
+    def _deliver(self, recipient, notifications):
+        message = self._build_message(recipient, notifications)
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.backend.send(message)
+                break
+            except Exception as e:
+                print(f"Failed to send notification to {recipient} (attempt {attempt}/{self.max_attempts}): {e}")
+                if attempt == self.max_attempts:
+                    self._finish(notifications, "failed", attempt, str(e))
+                    return
+                time.sleep(self.retry_base_delay * 2 ** (attempt - 1))
+
+        self._finish(notifications, "sent", attempt)
+
+    def _finish(self, notifications, status, attempts=0, error=None):
+        # Record the outcome on the notifications handed out by enqueue, and in the counters
+        finished_at = time.time()
+        with self._lock:
+            for notification in notifications:
+                notification.update(attempts=attempts, error=error, finished_at=finished_at, status=status)
+            if status == "sent":
+                self._sent += len(notifications)
+                self._latencies.extend(finished_at - n["queued_at"] for n in notifications)
+            else:
+                self._failed += len(notifications)
+                self._failures.extend(notifications)
+
+
+def _seconds(value):
+    return "n/a" if value is None else f"{value:.1f}s"
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Returns the process-wide dispatcher, creating it on first use. Shared by all Streamlit sessions."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            if notifications_enabled():
+                backend = SmtpBackend(SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS)
+            else:
+                backend = ConsoleBackend()
+            _dispatcher = NotificationDispatcher(backend)
+        return _dispatcher
+
+
 def send_rvp_email(recipient_email, form_link):
-    try:
-        # Initialize COM
-        pythoncom.CoInitialize()
-
-        # Use EnsureDispatch instead of Dispatch
-        outlook = win32.gencache.EnsureDispatch('outlook.application')
-        mail = outlook.CreateItem(0)
-        mail.To = recipient_email
-        mail.Subject = "CARE Submission Form Approval Required"
-        mail.Body = f"Please review and approve the CARE submission form at the following link:\n\n{form_link}"
-        mail.Send()
-
-        st.success("Approval request email sent to the RVP.")
-    except Exception as e:
-        st.error("Failed to send email through Outlook. Please ensure Outlook is open and try again.")
-        print("Error details:", e)
-    finally:
-        # Uninitialize COM to clean up
-        pythoncom.CoUninitialize()
+    """
+    Queues the approval request for the RVP; it is sent in the background, batched with any others.
+    Returns the queued notification, whose status shows whether it was eventually sent. The queue lives in
+    this process only, so a request still queued when the app restarts is lost.
+    """
+    notification = get_dispatcher().enqueue(recipient_email, RVP_EMAIL_SUBJECT, rvp_email_body(form_link))
+    st.success("Approval request email queued for the RVP.")
+    return notification
@@ -0,0 +1,338 @@
+import argparse
+import csv
+import io
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+from scripts.db_utils import connect_read_db, build_units_query, transform_units_data, get_top20_customers, \
+    ensure_window_buckets, current_snapshot_path, DEFAULT_EXPIRY_WINDOW_MONTHS, DEFAULT_MAX_DAYS_OUT_OF_SERVICE, UNITS_COLUMNS
+
+
+# Number of rows fetched from the database cursor per chunk
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Exports built in the app are held in memory by Streamlit's download button, so they are capped;
+# larger exports should use the command line (python -m scripts.export_utils), which streams to a file
+UI_EXPORT_MAX_BYTES = int(os.environ.get("CARE_UI_EXPORT_MAX_MB", "100")) * 1024 * 1024
+
+# Column the export queries select their paging key under; see iter_query_chunks
+PAGE_KEY = "_page_key"
+
+SUBMISSIONS_EXPORT_QUERY = f"SELECT rowid AS {PAGE_KEY}, * FROM CARE_Submissions WHERE 1 = 1"
+
+# Parquet column types of the units list export, matching transform_units_data
+UNITS_ARROW_TYPES = {
+    'Contract Expiry Date': pa.timestamp('ns'),
+    'Contract #': pa.int64(),
+    'Days Out of Service': pa.int64(),
+}
+UNITS_ARROW_SCHEMA = pa.schema([(column, UNITS_ARROW_TYPES.get(column, pa.string())) for column in UNITS_COLUMNS])
+
+
+def iter_query_chunks(query, params=(), chunk_size=EXPORT_CHUNK_SIZE, key="rowid"):
+    """
+    Runs a query page by page and yields the result as DataFrames of at most chunk_size rows.
+    The query must end with its WHERE clause and select key, a unique integer such as a rowid, as PAGE_KEY.
+    Pages are read in key order with "key > last key LIMIT chunk_size" (keyset paging), and PAGE_KEY is
+    dropped from the chunks. Every page is a complete, short read, so no lock is held on the primary database
+    while a chunk is being encoded and writers are never blocked for the length of an export. The trade-off
+    is that the pages are separate reads: a row changed during the export may be seen in either state.
+    An empty frame carrying the column names is yielded if the query returns no rows.
+    """
+    paged_query = f"{query} AND {key} > ? ORDER BY {key} LIMIT ?"
+    last_key = -2 ** 63  # Below any SQLite integer key
+    first_page = True
+    conn = connect_read_db()
+    try:
+        while True:
+            cursor = conn.execute(paged_query, [*params, last_key, chunk_size])
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+            if not rows:
+                if first_page:
+                    yield pd.DataFrame(columns=columns).drop(columns=PAGE_KEY)
+                break
+            first_page = False
+            chunk = pd.DataFrame.from_records(rows, columns=columns)
+            last_key = int(chunk[PAGE_KEY].iloc[-1])
+            yield chunk.drop(columns=PAGE_KEY)
+            if len(rows) < chunk_size:
+                break
+    finally:
+        conn.close()
+
+
+def iter_units_chunks(selected_branch, chunk_size=EXPORT_CHUNK_SIZE, expiry_months=DEFAULT_EXPIRY_WINDOW_MONTHS,
+                      max_days_out=DEFAULT_MAX_DAYS_OUT_OF_SERVICE):
+    """Yields the units list of a branch in chunks, with the same filters and columns as the Dashboard table."""
+    use_buckets = True
+    if current_snapshot_path() is None:
+        use_buckets = ensure_window_buckets()
+    query, params = build_units_query(selected_branch, expiry_months=expiry_months, max_days_out=max_days_out,
+                                      page_key=PAGE_KEY, use_buckets=use_buckets)
+    top20_customers = get_top20_customers(selected_branch)
+    for chunk in iter_query_chunks(query, params, chunk_size, key="UOS.rowid"):
+        yield transform_units_data(chunk, top20_customers)
+
+
+def build_submissions_query(region=None, branch_code=None, wo_type=None, approved_from=None, approved_to=None):
+    """
+    Builds the CARE_Submissions export query and its parameters from the optional filters.
+    Rows are exported in rowid order, which is the order they were approved in.
+    """
+    query = SUBMISSIONS_EXPORT_QUERY
+    params = []
+    if region:
+        query += " AND region = ?"
+        params.append(region)
+    if branch_code:
+        query += " AND branch_code = ?"
+        params.append(branch_code)
+    if wo_type:
+        query += " AND wo_type = ?"
+        params.append(wo_type)
+    if approved_from:
+        query += " AND rvp_approval_date >= ?"
+        params.append(str(approved_from))
+    if approved_to:
+        query += " AND rvp_approval_date <= ?"
+        params.append(str(approved_to))
+    return query, params
+
+
+def iter_submissions_chunks(chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """Yields the approved CARE_Submissions matching the filters in chunks."""
+    query, params = build_submissions_query(**filters)
+    with connect_read_db() as conn:
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CARE_Submissions'").fetchone()
+    if not has_table:
+        # Nothing has been approved yet, so there is nothing to export
+        yield pd.DataFrame()
+        return
+    yield from iter_query_chunks(query, params, chunk_size)
+
+
+def submissions_arrow_schema():
+    """
+    Builds the Parquet schema of the CARE_Submissions export from the declared SQLite column types,
+    so a column that is empty in the first chunk still gets its real type. None if there is no table yet.
+    """
+    with connect_read_db() as conn:
+        columns = conn.execute("PRAGMA table_info(CARE_Submissions)").fetchall()
+    if not columns:
+        return None
+
+    fields = []
+    for column in columns:
+        declared_type = (column[2] or "").upper()
+        if "INT" in declared_type:
+            arrow_type = pa.int64()
+        elif any(name in declared_type for name in ("REAL", "FLOA", "DOUB")):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column[1], arrow_type))
+    return pa.schema(fields)
+
+
+def stream_csv(chunks):
+    """Encodes DataFrame chunks as CSV, yielding the bytes of one chunk at a time."""
+    header = True
+    for chunk in chunks:
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=header, quoting=csv.QUOTE_MINIMAL)
+        header = False
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller instead of keeping them."""
+
+    def __init__(self):
+        super().__init__()
+        self._pending = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._pending.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._pending)
+        self._pending = []
+        return data
+
+
+def _arrow_schema(table):
+    # Columns that are entirely empty in the first chunk have no type yet; store them as strings
+    return pa.schema([
+        pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+        for field in table.schema
+    ])
+
+
+def stream_parquet(chunks, schema=None):
+    """
+    Encodes DataFrame chunks as a Parquet file with one row group per chunk, yielding bytes as they are written.
+    Every chunk is converted to schema, which should come from the known column types (UNITS_ARROW_SCHEMA,
+    submissions_arrow_schema); without one, types are inferred from the first chunk.
+    Empty chunks are skipped when a schema is given, since pandas types their columns arbitrarily.
+    """
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            if schema is not None and chunk.empty:
+                continue
+            if writer is None:
+                if schema is None:
+                    schema = _arrow_schema(pa.Table.from_pandas(chunk, preserve_index=False))
+                writer = pq.ParquetWriter(sink, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+        if writer is None and schema is not None:
+            # No rows at all; still write a valid file with the expected columns
+            writer = pq.ParquetWriter(sink, schema)
+            writer.write_table(schema.empty_table())
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def stream_excel(chunks, sheet_name="Export"):
+    """
+    Writes DataFrame chunks to an Excel workbook and yields the finished file in blocks.
+    The workbook is built in constant memory mode, which flushes each row to disk as it is written;
+    the xlsx container can only be produced once all rows are in, so bytes are yielded at the end.
+    """
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {
+            "constant_memory": True,
+            "default_date_format": "yyyy-mm-dd",
+            "remove_timezone": True,
+        })
+        worksheet = workbook.add_worksheet(sheet_name)
+        row_number = 0
+        for chunk in chunks:
+            if row_number == 0:
+                worksheet.write_row(0, 0, list(chunk.columns))
+                row_number = 1
+            # Blank out missing values, which Excel cannot store as NaN
+            values = chunk.astype(object).where(chunk.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                worksheet.write_row(row_number, 0, row)
+                row_number += 1
+        workbook.close()
+
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(1024 * 1024)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
+
+
+def stream_export(chunks, export_format, schema=None):
+    """Encodes DataFrame chunks in one of the EXPORT_FORMATS, yielding bytes. schema is used for Parquet."""
+    if export_format == "CSV":
+        return stream_csv(chunks)
+    if export_format == "Parquet":
+        return stream_parquet(chunks, schema)
+    if export_format == "Excel":
+        return stream_excel(chunks)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def export_file_name(prefix, export_format):
+    """Returns the download file name and MIME type for an export."""
+    extension, mime = EXPORT_FORMATS[export_format]
+    return f"{prefix}.{extension}", mime
+
+
+def export_bytes(stream, max_bytes=UI_EXPORT_MAX_BYTES):
+    """
+    Joins an export stream into a single bytes payload, as required by Streamlit's download button.
+    The whole file is held in memory, so this raises ValueError once the export grows past max_bytes.
+    """
+    blocks = []
+    size = 0
+    for block in stream:
+        size += len(block)
+        if size > max_bytes:
+            stream.close()
+            raise ValueError(
+                f"Export is larger than {max_bytes // (1024 * 1024)} MB. "
+                "Narrow the filters, or run it from the command line: python -m scripts.export_utils")
+        blocks.append(block)
+    return b"".join(blocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a branch units list or approved CARE submissions.")
+    subparsers = parser.add_subparsers(dest="dataset", required=True)
+
+    units_parser = subparsers.add_parser("units", help="Units out of service for a branch")
+    units_parser.add_argument("--branch", required=True)
+    units_parser.add_argument("--expiry-months", type=int, default=DEFAULT_EXPIRY_WINDOW_MONTHS)
+    units_parser.add_argument("--max-days-out", type=int, default=DEFAULT_MAX_DAYS_OUT_OF_SERVICE)
+
+    submissions_parser = subparsers.add_parser("submissions", help="Approved CARE submissions")
+    submissions_parser.add_argument("--region")
+    submissions_parser.add_argument("--branch-code")
+    submissions_parser.add_argument("--wo-type")
+    submissions_parser.add_argument("--approved-from", help="YYYY-MM-DD")
+    submissions_parser.add_argument("--approved-to", help="YYYY-MM-DD")
+
+    for subparser in (units_parser, submissions_parser):
+        subparser.add_argument("--format", choices=list(EXPORT_FORMATS), default="CSV")
+        subparser.add_argument("--output", required=True)
+        subparser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    args = parser.parse_args()
+    if args.dataset == "units":
+        chunks = iter_units_chunks(args.branch, args.chunk_size, args.expiry_months, args.max_days_out)
+        schema = UNITS_ARROW_SCHEMA
+    else:
+        schema = submissions_arrow_schema()
+        chunks = iter_submissions_chunks(
+            args.chunk_size,
+            region=args.region,
+            branch_code=args.branch_code,
+            wo_type=args.wo_type,
+            approved_from=args.approved_from,
+            approved_to=args.approved_to,
+        )
+
+    with open(args.output, "wb") as f:
+        for block in stream_export(chunks, args.format, schema):
+            f.write(block)
+    print(f"Export written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import app_test, local_script_runner
+from streamlit.testing.v1.util import patch_config_options
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import scripts.db_utils as db_utils  # noqa: E402
+
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+
+RVP_EMAIL = "rvp@example.com"
+REGIONS = ["Atlantic", "Central", "Prairies", "Quebec", "West"]
+CONTROLLERS = ["TAC 50", "TAC 20", "Otis Gen2", "KONE EcoDisc", "Schindler Miconic"]
+BILLING_FREQUENCIES = ["Monthly", "Bi-Monthly", "Quarterly", "Semi-Annually", "Annually", "Non-Billable"]
+
+
+def build_synthetic_db(path, units=5000, branches_per_region=4, seed=0):
+    """
+    Creates a database at path with the tables the app reads, filled with random but well-formed rows.
+    Out of service and contract expiry dates are spread around today so units fall on both sides of the
+    Dashboard filters.
+    Returns a list of (region, branch) pairs sessions can pick from.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    rng = random.Random(seed)
+    today = date.today()
+    branches = [(region, f"{region} Branch {i + 1}") for region in REGIONS for i in range(branches_per_region)]
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript("""
+            CREATE TABLE Canada_Hierarchy (Region TEXT, `Parent Branch` TEXT, Branch TEXT, `Branch Code` TEXT);
+            CREATE TABLE Canada_RVPs (email TEXT);
+            CREATE TABLE Units_Out_Of_Service (
+                Branch TEXT, `Serial Number` TEXT, `Building Address` TEXT, `Building Salesperson` TEXT,
+                `Out of Service Date` TEXT, Route TEXT, `CARE Submission` TEXT
+            );
+            CREATE TABLE Canada_Units (`Serial Number` TEXT, `Contract Number` TEXT, `Controller Name` TEXT);
+            CREATE TABLE Canada_Contracts (
+                `Contract #` TEXT, Customer TEXT, Branch TEXT, `Expiration Date` TEXT,
+                `Current Monthly Amount` TEXT, `Billing Frequency` TEXT
+            );
+            CREATE TABLE Routes (Route TEXT, Supervisor TEXT);
+        """)
+        conn.executemany(
+            "INSERT INTO Canada_Hierarchy VALUES (?, ?, ?, ?)",
+            [(region, branch, branch, f"B{i:03d}") for i, (region, branch) in enumerate(branches)])
+        conn.execute("INSERT INTO Canada_RVPs VALUES (?)", (RVP_EMAIL,))
+        conn.executemany(
+            "INSERT INTO Routes VALUES (?, ?)", [(f"R{i:03d}", f"Supervisor {i}") for i in range(100)])
+
+        unit_rows, contract_unit_rows, contract_rows = [], [], []
+        for i in range(units):
+            _, branch = branches[i % len(branches)]
+            unit_id = f"U{i:07d}"
+            contract_number = str(100000 + i)
+            unit_rows.append((
+                branch, unit_id, f"{i} Main Street", f"Salesperson {i % 40}",
+                (today - timedelta(days=rng.randint(0, 90))).isoformat(), f"R{i % 100:03d}", "No"))
+            contract_unit_rows.append((unit_id, contract_number, rng.choice(CONTROLLERS)))
+            contract_rows.append((
+                contract_number, f"Customer {i % 500}", branch,
+                (today + timedelta(days=rng.randint(-800, 540))).isoformat(),
+                f"${rng.randint(100, 20000):,}.00", rng.choice(BILLING_FREQUENCIES)))
+        conn.executemany("INSERT INTO Units_Out_Of_Service VALUES (?, ?, ?, ?, ?, ?, ?)", unit_rows)
+        conn.executemany("INSERT INTO Canada_Units VALUES (?, ?, ?)", contract_unit_rows)
+        conn.executemany("INSERT INTO Canada_Contracts VALUES (?, ?, ?, ?, ?, ?)", contract_rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return branches
+
+
+class RssSampler(threading.Thread):
+    """Samples the resident set size of this process in the background and keeps the peak."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+
+def current_rss_bytes():
+    """Returns the current resident set size, or the process peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    except ImportError:
+        return 0
+
+
+class _RuntimeSlot:
+    """Stand-in for the Runtime class inside AppTest, so its per-run install and reset go nowhere."""
+    _instance = None
+
+
+@contextmanager
+def shared_test_runtime():
+    """
+    AppTest installs a mock Runtime singleton and patches the config for each run, then clears them
+    when the run ends, which breaks any run still going on another thread. It also gives every session
+    its own script cache. Keep one shared runtime, config patch and script cache in place for the whole
+    load level instead, the way a single server process shares them between sessions.
+    Sharing the cache alone does not make the first runs thread-safe: on Python 3.11, compiling the app
+    scripts or importing the pages on several threads at once can fail with "AST constructor recursion
+    depth mismatch", so run_level warms both up with a single session before starting the others.
+    """
+    script_cache = ScriptCache()
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    with patch.object(app_test, "Runtime", _RuntimeSlot), \
+            patch.object(app_test, "patch_config_options", lambda overrides: nullcontext()), \
+            patch.object(local_script_runner, "ScriptCache", lambda: script_cache), \
+            patch_config_options({"global.appTest": True}):
+        Runtime._instance = runtime
+        try:
+            yield
+        finally:
+            Runtime._instance = None
+
+
+def _widget(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"Widget not found: {label}")
+
+
+class SessionRecorder:
+    """Collects the rerun timings and script exceptions of one simulated session."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.timings = []
+        self.errors = []
+
+    def run(self, at, step):
+        start = time.perf_counter()
+        at.run(timeout=self.timeout)
+        self.timings.append((step, time.perf_counter() - start))
+        for exception in at.exception:
+            self.errors.append(f"{step}: {exception.message}")
+        if at.exception:
+            raise RuntimeError(f"Script raised during {step}")
+
+
+def run_session(session_index, region, branch, timeout):
+    """
+    Simulates one DM logging in, picking a unit from their branch and submitting the CARE form,
+    followed by an RVP approving it. Returns the SessionRecorder with everything that was measured.
+    """
+    recorder = SessionRecorder(timeout)
+    try:
+        # DM: Landing page, then the Dashboard through app.py navigation
+        dm = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        recorder.run(dm, "landing")
+        _widget(dm.text_input, "Email Address").input(f"dm{session_index}@example.com")
+        _widget(dm.button, "Submit").click()
+        recorder.run(dm, "login")
+        recorder.run(dm, "open_dashboard")
+
+        _widget(dm.sidebar.selectbox, "Select Region").select(region)
+        recorder.run(dm, "select_region")
+        _widget(dm.sidebar.selectbox, "Select Branch").select(branch)
+        recorder.run(dm, "select_branch")
+        _widget(dm.sidebar.button, "Retrieve Units Data").click()
+        recorder.run(dm, "retrieve_units")
+
+        units_data = dm.session_state["units_data"]
+        if units_data.empty:
+            recorder.errors.append(f"retrieve_units: no units for {branch}")
+            return recorder
+        unit_id = str(units_data["Unit ID"].iloc[session_index % len(units_data)])
+        _widget(dm.text_input, "Enter the Unit ID to submit for review:").input(unit_id)
+        _widget(dm.button, "Submit selected unit for review").click()
+        recorder.run(dm, "select_unit")
+
+        # DM: CARE form, submitted for RVP approval
+        _widget(dm.sidebar.radio, "Go to").set_value("CARE Form")
+        recorder.run(dm, "open_form")
+        _widget(dm.text_input, "**WO #**").input(f"WO-{session_index}")
+        _widget(dm.button, "Submit for RVP Approval").click()
+        recorder.run(dm, "submit_form")
+
+        # RVP: signed in with the unit from the approval link, then the CARE form in approval mode
+        rvp = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        rvp.session_state["user_email"] = RVP_EMAIL
+        rvp.session_state["unit_id_for_review"] = unit_id
+        rvp.session_state["is_rvp_approval"] = True
+        rvp.session_state["selected_region"] = region
+        recorder.run(rvp, "open_approval")
+        _widget(rvp.sidebar.radio, "Go to").set_value("CARE Form")
+        recorder.run(rvp, "approval_form")
+        _widget(rvp.text_input, "**WO #**").input(f"WO-{session_index}")
+        _widget(rvp.number_input, "**Repair Team Hours Approved**").set_value(4.0)
+        _widget(rvp.button, "Approve and Submit").click()
+        recorder.run(rvp, "approve")
+    except Exception as e:
+        if not recorder.errors:
+            recorder.errors.append(f"{type(e).__name__}: {e}")
+    return recorder
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def prepare_db(db_path, units):
+    """Builds the synthetic database, points the app at it and fills in its window buckets."""
+    branches = build_synthetic_db(db_path, units=units)
+    db_utils.DB_PATH = db_path
+    db_utils.refresh_window_buckets()
+    return branches
+
+
+def run_level(sessions, db_path, units, timeout):
+    """Runs one load level against a freshly built database and returns its summary."""
+    branches = prepare_db(db_path, units)
+
+    with shared_test_runtime():
+        # One session on its own first, so the page imports and script compiles happen on a single thread;
+        # it is not measured, and the database is rebuilt afterwards to undo its submission
+        warmup = run_session(0, *branches[0], timeout)
+        if warmup.errors:
+            print(f"Warm-up session failed: {warmup.errors[0]}")
+        branches = prepare_db(db_path, units)
+
+        sampler = RssSampler()
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            futures = [
+                executor.submit(run_session, i, *branches[i % len(branches)], timeout)
+                for i in range(sessions)
+            ]
+            recorders = [future.result() for future in futures]
+        wall_seconds = time.perf_counter() - start
+        sampler.stop()
+
+    latencies = [seconds for recorder in recorders for _, seconds in recorder.timings]
+    errors = [error for recorder in recorders for error in recorder.errors]
+    lock_errors = [error for error in errors if "database is locked" in error]
+    by_step = {}
+    for recorder in recorders:
+        for step, seconds in recorder.timings:
+            by_step.setdefault(step, []).append(seconds)
+
+    return {
+        "sessions": sessions,
+        "completed": sum(1 for recorder in recorders if not recorder.errors),
+        "reruns": len(latencies),
+        "wall_seconds": wall_seconds,
+        "reruns_per_second": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": sampler.peak_bytes / (1024 * 1024),
+        "lock_errors": len(lock_errors),
+        "other_errors": len(errors) - len(lock_errors),
+        "errors": errors,
+        "by_step": by_step,
+    }
+
+
+def print_report(results, show_steps=False, show_errors=False):
+    header = (f"{'sessions':>8} {'done':>5} {'reruns':>7} {'wall s':>8} {'reruns/s':>9} "
+              f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'peak MB':>8} {'locked':>7} {'errors':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['sessions']:>8} {r['completed']:>5} {r['reruns']:>7} {r['wall_seconds']:>8.2f} "
+              f"{r['reruns_per_second']:>9.1f} {r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['peak_rss_mb']:>8.1f} {r['lock_errors']:>7} {r['other_errors']:>7}")
+
+    for r in results:
+        if show_steps:
+            print(f"\nPer-step latency at {r['sessions']} sessions (ms):")
+            for step, seconds in r["by_step"].items():
+                print(f"  {step:<16} p50 {percentile(seconds, 0.50) * 1000:>8.1f}   "
+                      f"p90 {percentile(seconds, 0.90) * 1000:>8.1f}   "
+                      f"p99 {percentile(seconds, 0.99) * 1000:>8.1f}")
+        if show_errors and r["errors"]:
+            print(f"\nErrors at {r['sessions']} sessions:")
+            for error in r["errors"]:
+                print(f"  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drive the Streamlit pages with concurrent simulated sessions against a synthetic database.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25],
+                        help="Session counts to run, one load level each")
+    parser.add_argument("--units", type=int, default=5000, help="Units out of service in the synthetic database")
+    parser.add_argument("--db", help="Where to build the synthetic database (defaults to a temporary file)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed for a single rerun")
+    parser.add_argument("--by-step", action="store_true", help="Also report latency for each step of a session")
+    parser.add_argument("--show-errors", action="store_true", help="List every error that was recorded")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="care_load_"), "CARE_Database.db")
+    print(f"Synthetic database: {db_path} ({args.units} units)\n")
+
+    results = [run_level(sessions, db_path, args.units, args.timeout) for sessions in args.sessions]
+    print_report(results, show_steps=args.by_step, show_errors=args.show_errors)
+
+
+if __name__ == "__main__":
+    main()
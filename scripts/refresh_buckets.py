@@ -0,0 +1,18 @@
+import argparse
+import time
+
+from scripts.db_utils import DB_PATH, refresh_window_buckets
+
+
+def main():
+    argparse.ArgumentParser(
+        description="Fill in the units list window buckets of the CARE database. Run this after every import, "
+                    "so the app never has to refresh them while a user waits.").parse_args()
+
+    start = time.perf_counter()
+    refresh_window_buckets()
+    print(f"Refreshed window buckets of {DB_PATH} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import email
+import socketserver
+import threading
+from email import policy
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib to deliver a message: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        sender, recipients = None, []
+        self.reply("220 smtp-sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+
+            if command in ("HELO", "EHLO"):
+                self.reply("250 smtp-sink")
+            elif command == "MAIL":
+                sender, recipients = argument.partition(":")[2].strip(), []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(argument.partition(":")[2].strip())
+                self.reply("250 OK")
+            elif command == "DATA":
+                if not recipients:
+                    self.reply("503 RCPT first")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                if self.server.next_delivery_fails():
+                    self.reply("451 Requested action aborted: simulated failure")
+                else:
+                    self.server.deliver(sender, recipients, b"".join(lines))
+                    self.reply("250 OK: queued")
+                sender, recipients = None, []
+            elif command == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """
+    Stand-in SMTP server for local testing, replacing the smtpd module removed in Python 3.12.
+    Received messages are kept in messages (and printed when verbose). The next fail_next deliveries
+    are rejected with a temporary 451 error, to exercise the notification retries.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=1025, fail_next=0, verbose=False):
+        super().__init__((host, port), _SmtpHandler)
+        self.fail_next = fail_next
+        self.verbose = verbose
+        self.messages = []
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def next_delivery_fails(self):
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def deliver(self, sender, recipients, data):
+        message = email.message_from_bytes(data, policy=policy.default)
+        with self._lock:
+            self.messages.append(message)
+        if self.verbose:
+            print(f"---------- From {sender} to {', '.join(recipients)}\n{message}\n----------")
+
+    def start(self):
+        """Serves from a background thread and returns the sink."""
+        threading.Thread(target=self.serve_forever, name="SmtpSink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP server that prints the messages it receives.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--fail-next", type=int, default=0, help="Reject this many deliveries first")
+    args = parser.parse_args()
+
+    sink = SmtpSink(args.host, args.port, args.fail_next, verbose=True)
+    print(f"SMTP sink listening on {args.host}:{sink.port}; set CARE_SMTP_HOST={args.host} "
+          f"and CARE_SMTP_PORT={sink.port}")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from scripts.db_utils import DB_PATH, SNAPSHOT_DIR, publish_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish read-only snapshots of the CARE database for app processes running in replica mode.")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR,
+                        help="Directory to publish into (defaults to CARE_SNAPSHOT_DIR)")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Seconds between refreshes; publish once and exit if not given")
+    parser.add_argument("--keep", type=int, default=3, help="Number of snapshots to keep on disk")
+    args = parser.parse_args()
+
+    if not args.snapshot_dir:
+        parser.error("--snapshot-dir is required when CARE_SNAPSHOT_DIR is not set")
+
+    while True:
+        start = time.perf_counter()
+        snapshot_path = publish_snapshot(args.snapshot_dir, keep=args.keep)
+        print(f"Published snapshot of {DB_PATH} to {snapshot_path} in {time.perf_counter() - start:.2f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()